@@ -1,5 +1,8 @@
 import os
+import argparse
 import logging
+import logging.handlers
+import queue
 import re
 from datetime import datetime
 import sys
@@ -9,8 +12,10 @@ import openpyxl
 from openpyxl.workbook import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from openpyxl.styles import PatternFill,Font,Alignment
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 import win32com.client
 import unicodedata
+from xls_reader import read_xls_sheets
 
 # Constants for consistent configuration
 LOG_DIR = 'logs'
@@ -20,6 +25,7 @@ DATETIME_PATTERNS = [
     '%Y-%m-%d', '%Y/%m/%d'
 ]
 TIME_RANGE_SEPARATORS = ['〜', '～', '~']
+NUMERIC_PATTERN = re.compile(r'-?\d+')
 SPEC_SHEETS = ["補助調書2","市内児童一覧","退所・受託児童一覧"]
 
 YELLOW_FILL = PatternFill(patternType="solid", fgColor='FFFF00')
@@ -27,10 +33,12 @@ ORANGE_FILL  = PatternFill(patternType="solid", fgColor="FFD966")
 
 PINK_FILL = PatternFill(patternType="solid", fgColor='FFC0CB')
 
+LOG_LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'ERROR': logging.ERROR}
+
 
 
 def setup_logging(debug_level='DEBUG'):
-    """Configure logging with file and console output for debugging and tracking."""
+    """Configure queued logging with file and console output written by a background thread."""
     # Ensure logs directory exists
     os.makedirs(LOG_DIR, exist_ok=True)
 
@@ -40,19 +48,38 @@ def setup_logging(debug_level='DEBUG'):
     log_format = '%(asctime)s - %(levelname)s - %(message)s'
 
     # Map string debug level to logging level constant
-    levels = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING}
-    logging_level = levels.get(debug_level, logging.WARNING)
-
-    # Configure logging with file and console handlers
-    logging.basicConfig(
-        level=logging_level,
-        format=log_format,
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    logging_level = LOG_LEVELS.get(debug_level, logging.WARNING)
+
+    # File and console handlers run on the listener thread, off the comparison hot path
+    formatter = logging.Formatter(log_format)
+    handlers = [
+        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    # The queue handler only renders the message; the listener's handlers apply log_format
+    logging.basicConfig(level=logging_level, format='%(message)s',
+                        handlers=[logging.handlers.QueueHandler(log_queue)])
+    listener.start()
     logging.info(f'Logging initialized at level: {debug_level}')
+    return listener
+
+
+def parse_args(argv=None):
+    """Parse command line options for logging and per-cell tracing."""
+    parser = argparse.ArgumentParser(description='Hojo data compare program')
+    parser.add_argument('--log-level', choices=list(LOG_LEVELS), default='DEBUG',
+                        help='logging level (default: DEBUG)')
+    parser.add_argument('--trace-sample', type=int, default=0, metavar='N',
+                        help='log every Nth compared cell at DEBUG level; 0 disables tracing (default: 0)')
+    args = parser.parse_args(argv)
+    if args.trace_sample < 0:
+        parser.error('--trace-sample must be 0 or greater')
+    return args
 
 
 def create_root():
@@ -173,6 +200,98 @@ def normalize_time_range(time_str):
     return time_str
 
 
+def classify_value(value):
+    """Classify a normalized, non-empty cell value as date, time range, numeric or text."""
+    if isinstance(value, datetime):
+        return 'date'
+    if any(sep in value for sep in TIME_RANGE_SEPARATORS):
+        return 'time_range'
+    if NUMERIC_PATTERN.fullmatch(value):
+        return 'numeric'
+    return 'text'
+
+
+def compare_generic(v1, v2):
+    """Compare two normalized values, detecting dates and time ranges cell by cell."""
+    v1_str = str(v1).strip() if not isinstance(v1, datetime) else v1
+    v2_str = str(v2).strip() if not isinstance(v2, datetime) else v2
+
+    # Handle datetime comparisons
+    if isinstance(v1, datetime) or isinstance(v2, datetime) or is_datetime_string(
+            v1_str) or is_datetime_string(v2_str):
+        return extract_date(v1) == extract_date(v2)
+
+    # Handle time range comparisons
+    if any(sep in str(v1) or sep in str(v2) for sep in TIME_RANGE_SEPARATORS):
+        return normalize_time_range(str(v1)) == normalize_time_range(str(v2))
+
+    # General comparison for other values
+    return v1_str == v2_str
+
+
+def compare_dates(v1, v2):
+    """Compare values of a date column, falling back to the generic path for non-dates."""
+    if isinstance(v1, datetime) or isinstance(v2, datetime):
+        return extract_date(v1) == extract_date(v2)
+    return compare_generic(v1, v2)
+
+
+def compare_time_ranges(v1, v2):
+    """Compare values of a time range column, falling back to the generic path otherwise."""
+    if (isinstance(v1, str) and isinstance(v2, str)
+            and classify_value(v1) == 'time_range' and classify_value(v2) == 'time_range'):
+        return normalize_time_range(v1) == normalize_time_range(v2)
+    return compare_generic(v1, v2)
+
+
+def compare_numbers(v1, v2):
+    """Compare values of a numeric column, falling back to the generic path otherwise."""
+    if (isinstance(v1, str) and isinstance(v2, str)
+            and NUMERIC_PATTERN.fullmatch(v1) and NUMERIC_PATTERN.fullmatch(v2)):
+        return v1 == v2
+    return compare_generic(v1, v2)
+
+
+COLUMN_COMPARATORS = {
+    'date': compare_dates,
+    'time_range': compare_time_ranges,
+    'numeric': compare_numbers,
+    'text': compare_generic,
+}
+
+
+def snapshot_cells(sheet1, sheet2, sheet_name, row_pairs, col_start):
+    """Normalize the compared cells of both sheets once, in comparison order."""
+    cells = []
+    errors = 0
+    for row1, row2 in row_pairs:
+        for col in range(col_start, 35):
+            if sheet_name == "市内児童一覧" and row2 > 9 and col == 14:
+                continue  # Skip column N (14) for rows > 9
+            try:
+                v1 = normalize_value(sheet1.cell(row1, col).value)
+                v2 = normalize_value(sheet2.cell(row2, col).value)
+            except Exception as e:
+                logging.error(f'Error at cell ({row2}, {col}): {e}')
+                errors += 1
+                continue
+            cells.append((row1, row2, col, v1, v2))
+    return cells, errors
+
+
+def infer_column_profiles(cells):
+    """Infer a profile (date, time range, numeric, text) for each compared column."""
+    kinds = {}
+    for _, _, col, v1, v2 in cells:
+        column_kinds = kinds.setdefault(col, set())
+        for value in (v1, v2):
+            if value is not None:
+                column_kinds.add(classify_value(value))
+    # Columns holding a single kind of data get a typed comparator; mixed ones stay generic
+    return {col: column_kinds.pop() if len(column_kinds) == 1 else 'text'
+            for col, column_kinds in kinds.items()}
+
+
 def recalculate_excel(file_path):
     """Recalculate Excel formulas in the specified file using COM (Windows only)."""
     try:
@@ -187,8 +306,30 @@ def recalculate_excel(file_path):
     except Exception as e:
         logging.error(f"Failed to recalculate {file_path}: {e}")
         raise
-    
-import logging
+
+
+def load_xls_workbook(file_path):
+    """Load cached cell values of a legacy .xls file into a new workbook, saved later as .xlsx."""
+    wb = Workbook()
+    wb.remove(wb.active)
+    for xls_sheet in read_xls_sheets(file_path):
+        sheet = wb.create_sheet(xls_sheet.name)
+        sheet.sheet_state = xls_sheet.state
+        for row, col, value in xls_sheet.cells:
+            cell = sheet.cell(row, col)
+            cell.value = ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+            if cell.data_type == 'f':
+                cell.data_type = 's'  # Keep cached text such as '=...' as a value, not a formula
+    logging.info(f"Loaded {len(wb.worksheets)} sheets from legacy file {file_path}")
+    return wb
+
+
+def load_workbook_values(file_path):
+    """Load cell values from an .xlsx workbook or a legacy .xls workbook."""
+    if file_path.lower().endswith('.xls'):
+        return load_xls_workbook(file_path)
+    return openpyxl.load_workbook(file_path, data_only=True)
+
 
 def add_headers(row, value, headers, ignore_list=None):
     if value and value not in headers.values() and (not ignore_list or value not in ignore_list):
@@ -297,15 +438,18 @@ def get_row_headers(sheet1, sheet2, sheet_name):
         return [], {}, {}, {}, {}, 1
 
 
-def compare_excel_files(file1_path, file2_path):
-    """Compare two Excel files, highlight differences, and return results."""
+def compare_excel_files(file1_path, file2_path, trace_sample=0):
+    """Compare two Excel files, highlight differences, and return results.
+
+    When trace_sample is N > 0, every Nth compared cell is logged at DEBUG level.
+    """
     logging.info(f'Comparing files: {file1_path} vs {file2_path}')
     reports = []
     try:
         # Recalculate formulas in the second file
         recalculate_excel(file2_path)
-        wb1 = openpyxl.load_workbook(file1_path, data_only=True)
-        wb2 = openpyxl.load_workbook(file2_path, data_only=True)
+        wb1 = load_workbook_values(file1_path)
+        wb2 = load_workbook_values(file2_path)
         mismatch_count = 0
 
         # Map visible sheets by their titles
@@ -342,66 +486,36 @@ def compare_excel_files(file1_path, file2_path):
                 row_pairs = [(row, row) for row in range(1, row_max + 1)]
                 col_start = 1
 
-            for row1, row2 in row_pairs:
+            # Normalize every compared cell once, then pick a comparator per column
+            cells, snapshot_errors = snapshot_cells(sheet1, sheet2, sheet_name, row_pairs, col_start)
+            mismatch_count += snapshot_errors
+            column_profiles = infer_column_profiles(cells)
+            comparators = {col: COLUMN_COMPARATORS[profile] for col, profile in column_profiles.items()}
+            logging.debug('Column profiles for %s: %s', sheet_name, column_profiles)
 
-                for col in range(col_start, 35):
+            # Sampled per-cell trace, kept out of the compare loop entirely when disabled
+            if trace_sample and logging.getLogger().isEnabledFor(logging.DEBUG):
+                for row1, row2, col, v1, v2 in cells[::trace_sample]:
+                    logging.debug('Cell (%s, %s): %s vs %s', row2, col, v1, v2)
 
-                    if sheet_name == "市内児童一覧" and row2 > 9 and col == 14:
-                        continue  # Skip column N (14) for rows > 9
-
-                    try:
-
-                        v1 = normalize_value(sheet1.cell(row1, col).value)
-                        v2 = normalize_value(sheet2.cell(row2, col).value)
-                        logging.debug(f'Cell ({row2}, {col}): {v1} vs {v2}')
-
-                        if v1 is None and v2 is None:
-                            continue
-
-                        v1_str = str(v1).strip() if not isinstance(v1, datetime) else v1
-                        v2_str = str(v2).strip() if not isinstance(v2, datetime) else v2
-
-                        # Handle datetime comparisons
-                        if isinstance(v1, datetime) or isinstance(v2, datetime) or is_datetime_string(
-                                v1_str) or is_datetime_string(v2_str):
-                            if extract_date(v1) != extract_date(v2):
-                                sheet2.cell(row2, col).fill = PINK_FILL
-                                mismatch_count += 1
-                                sheet_mismatches += 1
-                                sheet_report.append({
-                                    'row1': row1, 'col1': col, 'val1': v1,
-                                    'row2': row2, 'col2': col, 'val2': v2
-                                })
-                            continue
-
-                        # Handle time range comparisons
-                        if any(sep in str(v1) or sep in str(v2) for sep in TIME_RANGE_SEPARATORS):
-                            t1 = normalize_time_range(str(v1))
-                            t2 = normalize_time_range(str(v2))
-                            if t1 != t2:
-                                sheet2.cell(row2, col).fill = PINK_FILL
-                                mismatch_count += 1
-                                sheet_mismatches += 1
-                                sheet_report.append({
-                                    'row1': row1, 'col1': col, 'val1': v1,
-                                    'row2': row2, 'col2': col, 'val2': v2
-                                })
-                            continue
-
-                        # General comparison for other values
-                        if v1_str != v2_str:
-                            sheet2.cell(row2, col).fill = PINK_FILL
-                            mismatch_count += 1
-                            sheet_mismatches += 1
-                            sheet_report.append({
-                                'row1': row1, 'col1': col, 'val1': v1,
-                                'row2': row2, 'col2': col, 'val2': v2
-                            })
+            for row1, row2, col, v1, v2 in cells:
+                try:
+                    if v1 is None and v2 is None:
+                        continue
 
-                    except Exception as e:
-                        logging.error(f'Error at cell ({row2}, {col}): {e}')
+                    if not comparators[col](v1, v2):
+                        sheet2.cell(row2, col).fill = PINK_FILL
                         mismatch_count += 1
-                        continue
+                        sheet_mismatches += 1
+                        sheet_report.append({
+                            'row1': row1, 'col1': col, 'val1': v1,
+                            'row2': row2, 'col2': col, 'val2': v2
+                        })
+
+                except Exception as e:
+                    logging.error(f'Error at cell ({row2}, {col}): {e}')
+                    mismatch_count += 1
+                    continue
 
             if sheet_name in SPEC_SHEETS:
                 if not_pair_headers1:
@@ -602,7 +716,7 @@ def generate_report(all_reports,compare_folder):
     return report_path
 
 
-def process_folder(compare_folder):
+def process_folder(compare_folder, trace_sample=0):
     """Process all subfolders in the recompare directory, comparing Excel files."""
     try:
         all_reports = []
@@ -643,7 +757,7 @@ def process_folder(compare_folder):
                 logging.info(f'Processing: {file_name} vs {file2_name}')
 
                 try:
-                    result, modified_wb, reports = compare_excel_files(file1, file2)
+                    result, modified_wb, reports = compare_excel_files(file1, file2, trace_sample)
                     output_path = os.path.join(result_path, f"{result}_{base_name}.xlsx")
                     modified_wb.save(output_path)
                     logging.info(f'Saved result to: {output_path}')
@@ -673,7 +787,8 @@ def process_folder(compare_folder):
 
 def main():
     """Main function to run the Excel comparison program."""
-    setup_logging('DEBUG')
+    args = parse_args()
+    listener = setup_logging(args.log_level)
     logging.info('Starting Excel comparison program')
     root = None
 
@@ -688,7 +803,7 @@ def main():
         logging.info(f'Selected recompare folder: {compare_folder}')
         show_message("比較を開始します", "比較プロセスを開始しています....")
 
-        if process_folder(compare_folder):
+        if process_folder(compare_folder, args.trace_sample):
             logging.info('Comparison completed successfully')
             show_message("比較が完了しました", "比較プロセスが完了しました.")
         else:
@@ -701,6 +816,8 @@ def main():
         logging.info('Program finished')
         if root:
             root.destroy()
+        # Flush queued records before exiting
+        listener.stop()
 
 
 if __name__ == "__main__":
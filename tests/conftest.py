@@ -0,0 +1,5 @@
+import os
+import sys
+
+# main.py and xls_reader.py live at the repository root, outside any package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,192 @@
+"""Regenerate the BIFF8 .xls fixtures used by test_xls_reader.py.
+
+Run from the repository root: python tests/fixtures/build_xls_fixtures.py
+"""
+import os
+import struct
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+SECTOR_SIZE = 512
+MINI_SECTOR_SIZE = 64
+MINI_CUTOFF = 4096
+END_OF_CHAIN = 0xFFFFFFFE
+FAT_SECTOR = 0xFFFFFFFD
+NO_STREAM = 0xFFFFFFFF
+
+EOF_RECORD = struct.pack('<HH', 0x000A, 0)
+
+
+def record(record_type, data):
+    return struct.pack('<HH', record_type, len(data)) + data
+
+
+def bof(substream_type):
+    return record(0x0809, struct.pack('<HHHHII', 0x0600, substream_type, 0, 0, 0, 0))
+
+
+def xl_string(text, length_size=2):
+    try:
+        chars, flags = text.encode('latin-1'), 0
+    except UnicodeEncodeError:
+        chars, flags = text.encode('utf-16-le'), 1
+    return struct.pack('<B' if length_size == 1 else '<H', len(text)) + bytes([flags]) + chars
+
+
+def cell(record_type, row, col, xf, fmt, *values):
+    return record(record_type, struct.pack('<HHH' + fmt, row, col, xf, *values))
+
+
+def label(row, col, text):
+    return record(0x0204, struct.pack('<HHH', row, col, 0) + xl_string(text))
+
+
+def rk_int(value):
+    return ((value & 0x3FFFFFFF) << 2) | 0x02
+
+
+def workbook_stream(sheets, sst=b'', formats=(), xf_formats=(0,), filler=0):
+    """Build a BIFF8 Workbook stream from (name, state, type, body records) tuples."""
+    globals_head = bof(0x0005) + record(0x0022, struct.pack('<H', 0))
+    for format_id, code in formats:
+        globals_head += record(0x041E, struct.pack('<H', format_id) + xl_string(code))
+    for format_id in xf_formats:
+        globals_head += record(0x00E0, struct.pack('<HH', 0, format_id) + b'\0' * 16)
+    if filler:
+        globals_head += record(0x00EF, b'\0' * filler)  # Unknown record, pushes the stream size up
+
+    def boundsheet(offset, name, state, sheet_type):
+        return record(0x0085, struct.pack('<IBB', offset, state, sheet_type) + xl_string(name, 1))
+
+    boundsheets_size = sum(len(boundsheet(0, name, 0, 0)) for name, _, _, _ in sheets)
+    offset = len(globals_head) + boundsheets_size + len(sst) + len(EOF_RECORD)
+    boundsheets = b''
+    bodies = b''
+    for name, state, sheet_type, body in sheets:
+        boundsheets += boundsheet(offset + len(bodies), name, state, sheet_type)
+        bodies += body
+    return globals_head + boundsheets + sst + EOF_RECORD + bodies
+
+
+def compound_file(entries):
+    """Build an OLE2 compound file from a flat directory array.
+
+    Each entry is (name, type, data, left, right, child); type 5 is the root,
+    1 a storage and 2 a stream. Streams under the cutoff go to the mini stream.
+    """
+    sectors, fat = [], []
+
+    def allocate(data):
+        count = max(1, -(-len(data) // SECTOR_SIZE))
+        start = len(sectors)
+        for index in range(count):
+            sectors.append(data[index * SECTOR_SIZE:(index + 1) * SECTOR_SIZE].ljust(SECTOR_SIZE, b'\0'))
+            fat.append(start + index + 1 if index < count - 1 else END_OF_CHAIN)
+        return start
+
+    mini_stream, minifat, starts = b'', [], []
+    for name, entry_type, data, _, _, _ in entries:
+        if entry_type != 2:
+            starts.append(END_OF_CHAIN)
+        elif len(data) < MINI_CUTOFF:
+            count = max(1, -(-len(data) // MINI_SECTOR_SIZE))
+            start = len(minifat)
+            minifat.extend(start + index + 1 if index < count - 1 else END_OF_CHAIN for index in range(count))
+            mini_stream += data.ljust(count * MINI_SECTOR_SIZE, b'\0')
+            starts.append(start)
+        else:
+            starts.append(allocate(data))
+
+    minifat_start = allocate(b''.join(struct.pack('<I', sid) for sid in minifat)) if minifat else END_OF_CHAIN
+    root_start = allocate(mini_stream) if mini_stream else END_OF_CHAIN
+
+    directory = b''
+    for (name, entry_type, data, left, right, child), start in zip(entries, starts):
+        encoded = name.encode('utf-16-le') + b'\0\0'
+        entry = encoded.ljust(64, b'\0') + struct.pack('<HBB', len(encoded), entry_type, 1)
+        entry += struct.pack('<III', left, right, child)
+        if entry_type == 5:
+            start, size = root_start, len(mini_stream)
+        else:
+            size = len(data) if entry_type == 2 else 0
+        directory += entry.ljust(116, b'\0') + struct.pack('<II', start, size) + b'\0' * 4
+    directory_start = allocate(directory.ljust(-(-len(directory) // SECTOR_SIZE) * SECTOR_SIZE, b'\0'))
+
+    fat_sector = len(sectors)
+    fat.append(FAT_SECTOR)
+    sectors.append(b''.join(struct.pack('<I', sid) for sid in fat).ljust(SECTOR_SIZE, b'\xff'))
+
+    header = bytes.fromhex('d0cf11e0a1b11ae1') + b'\0' * 16
+    header += struct.pack('<HHHHH', 0x3E, 3, 0xFFFE, 9, 6) + b'\0' * 6 + struct.pack('<I', 0)
+    header += struct.pack('<8I', 1, directory_start, 0, MINI_CUTOFF, minifat_start,
+                          -(-len(minifat) * 4 // SECTOR_SIZE), END_OF_CHAIN, 0)
+    header += struct.pack('<109I', fat_sector, *([NO_STREAM] * 108))
+    return header + b''.join(sectors)
+
+
+def main_workbook():
+    """Values of every supported cell kind, a hidden sheet and an embedded workbook."""
+    # Shared strings; the second one is split across a CONTINUE record
+    sst = record(0x00FC, struct.pack('<II', 3, 3) + xl_string('abc')
+                 + struct.pack('<HB', 5, 1) + 'あい'.encode('utf-16-le'))
+    sst += record(0x003C, b'\x01' + 'うえお'.encode('utf-16-le') + xl_string('9:00〜17:00'))
+
+    chart = bof(0x0020) + cell(0x0203, 99, 99, 0, 'd', 1.0) + EOF_RECORD
+    visible = (
+        bof(0x0010)
+        + cell(0x00FD, 0, 0, 0, 'I', 0)
+        + cell(0x00FD, 0, 1, 0, 'I', 1)
+        + cell(0x0203, 1, 0, 1, 'd', 45292.0)           # Custom date format
+        + cell(0x027E, 1, 1, 0, 'I', rk_int(123))
+        + cell(0x0203, 1, 2, 2, 'd', 45292.5)           # Built-in date format 14
+        + record(0x00BD, struct.pack('<HH', 2, 0) + struct.pack('<HI', 0, (150 << 2) | 0x03)
+                 + struct.pack('<HI', 0, rk_int(-7)) + struct.pack('<H', 1))
+        + chart
+        + cell(0x0006, 3, 0, 0, '8s6s', b'\0' * 6 + b'\xff\xff', b'\0' * 6)
+        + record(0x0207, xl_string('cached'))
+        + cell(0x0006, 3, 1, 0, 'd6s', 2.5, b'\0' * 6)
+        + cell(0x0205, 3, 2, 0, 'BB', 0x07, 1)
+        + label(4, 0, 'label')
+        + EOF_RECORD
+    )
+    hidden = bof(0x0010) + cell(0x00FD, 0, 0, 0, 'I', 2) + EOF_RECORD
+
+    main = workbook_stream(
+        [('Sheet1', 0, 0, visible), ('隠し', 1, 0, hidden)], sst=sst,
+        formats=[(164, 'yyyy"年"m"月"d"日"')], xf_formats=(0, 164, 14), filler=MINI_CUTOFF)
+    embedded = workbook_stream(
+        [('Embedded', 0, 0, bof(0x0010) + label(0, 0, 'EMBEDDED') + EOF_RECORD)])
+
+    # The embedded MBD storage's Workbook comes first in the directory array
+    return compound_file([
+        ('Root Entry', 5, b'', NO_STREAM, NO_STREAM, 1),
+        ('MBD0001', 1, b'', NO_STREAM, 3, 2),
+        ('Workbook', 2, embedded, NO_STREAM, NO_STREAM, NO_STREAM),
+        ('Workbook', 2, main, NO_STREAM, NO_STREAM, NO_STREAM),
+    ])
+
+
+def sst_overcount_workbook():
+    """A small workbook whose SST claims more unique strings than it stores."""
+    sst = record(0x00FC, struct.pack('<II', 5, 5) + xl_string('one') + xl_string('two'))
+    body = bof(0x0010) + cell(0x00FD, 0, 0, 0, 'I', 0) + cell(0x00FD, 0, 1, 0, 'I', 1) + EOF_RECORD
+    return compound_file([
+        ('Root Entry', 5, b'', NO_STREAM, NO_STREAM, 1),
+        ('Workbook', 2, workbook_stream([('Sheet1', 0, 0, body)], sst=sst), NO_STREAM, NO_STREAM, NO_STREAM),
+    ])
+
+
+def charts_only_workbook():
+    """A workbook whose only sheet is a chart sheet."""
+    body = bof(0x0020) + EOF_RECORD
+    return compound_file([
+        ('Root Entry', 5, b'', NO_STREAM, NO_STREAM, 1),
+        ('Workbook', 2, workbook_stream([('Chart1', 0, 2, body)]), NO_STREAM, NO_STREAM, NO_STREAM),
+    ])
+
+
+if __name__ == '__main__':
+    for file_name, build in [('main.xls', main_workbook),
+                             ('sst_overcount.xls', sst_overcount_workbook),
+                             ('charts_only.xls', charts_only_workbook)]:
+        with open(os.path.join(FIXTURE_DIR, file_name), 'wb') as f:
+            f.write(build())
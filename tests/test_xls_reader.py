@@ -0,0 +1,85 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from xls_reader import XlsReadError, decode_rk, read_xls_sheets
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def read_fixture(file_name):
+    """Read every sheet of a fixture into {name: (state, {(row, col): value})}."""
+    return {sheet.name: (sheet.state, {(row, col): value for row, col, value in sheet.cells})
+            for sheet in read_xls_sheets(os.path.join(FIXTURE_DIR, file_name))}
+
+
+@pytest.fixture(scope='module')
+def main_sheets():
+    return read_fixture('main.xls')
+
+
+def test_reads_root_workbook_not_embedded_one(main_sheets):
+    assert list(main_sheets) == ['Sheet1', '隠し']
+
+
+def test_hidden_sheet_state(main_sheets):
+    assert main_sheets['Sheet1'][0] == 'visible'
+    assert main_sheets['隠し'][0] == 'hidden'
+
+
+def test_shared_strings_split_across_continue(main_sheets):
+    cells = main_sheets['Sheet1'][1]
+    assert cells[(1, 1)] == 'abc'
+    assert cells[(1, 2)] == 'あいうえお'
+    assert main_sheets['隠し'][1] == {(1, 1): '9:00〜17:00'}
+
+
+def test_number_rk_and_mulrk_cells(main_sheets):
+    cells = main_sheets['Sheet1'][1]
+    assert cells[(2, 2)] == 123
+    assert cells[(3, 1)] == 1.5
+    assert cells[(3, 2)] == -7
+
+
+def test_date_formats(main_sheets):
+    cells = main_sheets['Sheet1'][1]
+    assert cells[(2, 1)] == datetime(2024, 1, 1)  # Custom yyyy"年"m"月"d"日"
+    assert cells[(2, 3)] == datetime(2024, 1, 1, 12, 0)  # Built-in format 14
+
+
+def test_cached_formula_results(main_sheets):
+    cells = main_sheets['Sheet1'][1]
+    assert cells[(4, 1)] == 'cached'
+    assert cells[(4, 2)] == 2.5
+    assert cells[(4, 3)] == '#DIV/0!'
+    assert cells[(5, 1)] == 'label'
+
+
+def test_embedded_chart_substream_is_skipped(main_sheets):
+    assert (100, 100) not in main_sheets['Sheet1'][1]
+
+
+def test_sst_with_overstated_count():
+    assert read_fixture('sst_overcount.xls') == {'Sheet1': ('visible', {(1, 1): 'one', (1, 2): 'two'})}
+
+
+def test_chart_only_workbook_raises():
+    with pytest.raises(XlsReadError, match='No worksheets'):
+        read_fixture('charts_only.xls')
+
+
+def test_non_ole_file_raises(tmp_path):
+    path = tmp_path / 'fake.xls'
+    path.write_bytes(b'<html></html>')
+    with pytest.raises(XlsReadError):
+        list(read_xls_sheets(str(path)))
+
+
+@pytest.mark.parametrize('rk, expected', [
+    ((123 << 2) | 0x02, 123),
+    ((150 << 2) | 0x03, 1.5),
+    (0x3FF00000, 1.0),
+])
+def test_decode_rk(rk, expected):
+    assert decode_rk(rk) == expected
@@ -0,0 +1,387 @@
+"""Streaming reader for legacy BIFF8 (.xls) workbooks.
+
+Cached cell values are read straight from the OLE2 compound file, one sheet at a
+time, without Excel or any third-party .xls library.
+"""
+import re
+import struct
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+MAX_REGULAR_SECTOR = 0xFFFFFFFA
+END_OF_CHAIN = 0xFFFFFFFE
+NO_STREAM = 0xFFFFFFFF
+DIR_ENTRY_SIZE = 128
+
+# BIFF8 record types
+RECORD_BOF = 0x0809
+RECORD_EOF = 0x000A
+RECORD_CONTINUE = 0x003C
+RECORD_FILEPASS = 0x002F
+RECORD_DATEMODE = 0x0022
+RECORD_FORMAT = 0x041E
+RECORD_XF = 0x00E0
+RECORD_BOUNDSHEET = 0x0085
+RECORD_SST = 0x00FC
+RECORD_NUMBER = 0x0203
+RECORD_RK = 0x027E
+RECORD_MULRK = 0x00BD
+RECORD_LABELSST = 0x00FD
+RECORD_LABEL = 0x0204
+RECORD_RSTRING = 0x00D6
+RECORD_BOOLERR = 0x0205
+RECORD_FORMULA = 0x0006
+RECORD_STRING = 0x0207
+BIFF8_VERSION = 0x0600
+
+SHEET_STATES = {0: 'visible', 1: 'hidden', 2: 'veryHidden'}
+ERROR_CODES = {
+    0x00: '#NULL!', 0x07: '#DIV/0!', 0x0F: '#VALUE!', 0x17: '#REF!',
+    0x1D: '#NAME?', 0x24: '#NUM!', 0x2A: '#N/A'
+}
+
+# Built-in number formats that hold dates or times, including the CJK locale ones
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | set(range(27, 37)) | {45, 46, 47} | set(range(50, 59))
+BUILTIN_TIMEDELTA_FORMATS = {46}
+WINDOWS_EPOCH = datetime(1899, 12, 30)
+MAC_EPOCH = datetime(1904, 1, 1)
+
+# Same date/duration detection rules openpyxl applies to .xlsx number formats
+FORMAT_STRIP_RE = re.compile(r'"[^"]*"|\\.|_.|\*.|\[(?!(?:h+|m+|s+)\])[^\]]*\]', re.IGNORECASE)
+DATE_FORMAT_RE = re.compile(r'(?<![_\\])[dmhysDMHYS]')
+TIMEDELTA_FORMAT_RE = re.compile(r'\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?', re.IGNORECASE)
+
+XlsSheet = namedtuple('XlsSheet', ['name', 'state', 'cells'])
+
+
+class XlsReadError(Exception):
+    """Raised when a file is not a readable BIFF8 workbook."""
+
+
+def read_workbook_stream(data):
+    """Extract the BIFF8 Workbook stream from an OLE2 compound file."""
+    if data[:8] != OLE_SIGNATURE:
+        raise XlsReadError('Not an OLE2 compound file')
+
+    sector_shift, mini_sector_shift = struct.unpack_from('<HH', data, 0x1E)
+    sector_size = 1 << sector_shift
+    mini_sector_size = 1 << mini_sector_shift
+    (fat_count, first_dir_sector, _, mini_cutoff, first_minifat_sector,
+     _, first_difat_sector, difat_count) = struct.unpack_from('<8I', data, 0x2C)
+    entries_per_sector = sector_size // 4
+
+    def read_sector(sid):
+        start = (sid + 1) * sector_size
+        return data[start:start + sector_size]
+
+    def read_chain(start, table, read_block):
+        blocks = []
+        sid = start
+        seen = set()
+        while sid <= MAX_REGULAR_SECTOR:
+            if sid in seen or sid >= len(table):
+                raise XlsReadError('Corrupt sector chain')
+            seen.add(sid)
+            blocks.append(read_block(sid))
+            sid = table[sid]
+        return b''.join(blocks)
+
+    def unpack_sids(block):
+        return struct.unpack(f'<{len(block) // 4}I', block[:len(block) // 4 * 4])
+
+    # Collect FAT sector ids from the header and any DIFAT sectors
+    fat_sectors = list(struct.unpack_from('<109I', data, 0x4C))
+    sid = first_difat_sector
+    for _ in range(difat_count):
+        if sid > MAX_REGULAR_SECTOR:
+            break
+        difat = unpack_sids(read_sector(sid))
+        fat_sectors.extend(difat[:entries_per_sector - 1])
+        sid = difat[entries_per_sector - 1]
+
+    fat = []
+    for sid in fat_sectors[:fat_count]:
+        fat.extend(unpack_sids(read_sector(sid)))
+
+    directory = read_chain(first_dir_sector, fat, read_sector)
+    entry_count = len(directory) // DIR_ENTRY_SIZE
+    if not entry_count:
+        raise XlsReadError('Empty compound file directory')
+    root_start, = struct.unpack_from('<I', directory, 116)
+
+    # Walk the root storage's sibling tree only, so streams of embedded
+    # objects (e.g. an MBD... storage holding its own Workbook) are ignored
+    entries = {}
+    pending = [struct.unpack_from('<I', directory, 76)[0]]
+    seen = set()
+    while pending:
+        did = pending.pop()
+        if did == NO_STREAM:
+            continue
+        if did in seen or did >= entry_count:
+            raise XlsReadError('Corrupt directory tree')
+        seen.add(did)
+        offset = did * DIR_ENTRY_SIZE
+        name_length, = struct.unpack_from('<H', directory, offset + 64)
+        name = directory[offset:offset + max(name_length - 2, 0)].decode('utf-16-le', 'ignore')
+        entry_type = directory[offset + 66]
+        left, right = struct.unpack_from('<II', directory, offset + 68)
+        start, size = struct.unpack_from('<II', directory, offset + 116)
+        pending.extend((left, right))
+        if entry_type == 2:
+            entries[name.lower()] = (start, size)
+
+    if 'workbook' not in entries:
+        if 'book' in entries:
+            raise XlsReadError('BIFF5 and older .xls files are not supported')
+        raise XlsReadError('No Workbook stream found')
+    start, size = entries['workbook']
+
+    if size < mini_cutoff:
+        mini_stream = read_chain(root_start, fat, read_sector)
+        minifat = unpack_sids(read_chain(first_minifat_sector, fat, read_sector))
+        stream = read_chain(
+            start, minifat,
+            lambda mini_sid: mini_stream[mini_sid * mini_sector_size:(mini_sid + 1) * mini_sector_size])
+    else:
+        stream = read_chain(start, fat, read_sector)
+    return stream[:size]
+
+
+def iter_records(stream, offset=0):
+    """Yield (record type, data, continuation segments) from a BIFF stream."""
+    end = len(stream)
+    pos = offset
+    while pos + 4 <= end:
+        record_type, length = struct.unpack_from('<HH', stream, pos)
+        data = stream[pos + 4:pos + 4 + length]
+        pos += 4 + length
+        continues = []
+        while pos + 4 <= end:
+            next_type, next_length = struct.unpack_from('<HH', stream, pos)
+            if next_type != RECORD_CONTINUE:
+                break
+            continues.append(stream[pos + 4:pos + 4 + next_length])
+            pos += 4 + next_length
+        yield record_type, data, continues
+
+
+class SegmentReader:
+    """Read BIFF8 unicode strings that may be split across CONTINUE records."""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.index = 0
+        self.pos = 0
+
+    def at_end(self):
+        """Check if every segment has been fully read."""
+        return (self.pos >= len(self.segments[self.index])
+                and not any(self.segments[self.index + 1:]))
+
+    def next_segment(self):
+        self.index += 1
+        self.pos = 0
+        if self.index >= len(self.segments):
+            raise XlsReadError('Unexpected end of record data')
+
+    def read(self, size):
+        chunks = []
+        while size:
+            segment = self.segments[self.index]
+            if self.pos >= len(segment):
+                self.next_segment()
+                continue
+            chunk = segment[self.pos:self.pos + size]
+            chunks.append(chunk)
+            self.pos += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def read_string(self, length_size=2):
+        """Read an XLUnicodeString, skipping rich text runs and phonetic data."""
+        length, = struct.unpack('<B' if length_size == 1 else '<H', self.read(length_size))
+        flags = self.read(1)[0]
+        runs, = struct.unpack('<H', self.read(2)) if flags & 0x08 else (0,)
+        extra, = struct.unpack('<I', self.read(4)) if flags & 0x04 else (0,)
+        high_byte = flags & 0x01
+        chars = []
+        while length:
+            segment = self.segments[self.index]
+            available = (len(segment) - self.pos) >> high_byte
+            if not available:
+                # Character data continues in the next record behind a fresh flags byte
+                self.next_segment()
+                high_byte = self.read(1)[0] & 0x01
+                continue
+            count = min(length, available)
+            raw = segment[self.pos:self.pos + (count << high_byte)]
+            self.pos += count << high_byte
+            chars.append(raw.decode('utf-16-le' if high_byte else 'latin-1'))
+            length -= count
+        self.read(runs * 4 + extra)
+        return ''.join(chars)
+
+
+def decode_rk(rk):
+    """Decode an RK number into an int or float."""
+    if rk & 0x02:
+        value = struct.unpack('<i', struct.pack('<I', rk))[0] >> 2
+    else:
+        value = struct.unpack('<d', struct.pack('<Q', (rk & 0xFFFFFFFC) << 32))[0]
+    if rk & 0x01:
+        value /= 100
+    return value
+
+
+def is_date_format(format_code):
+    """Check if a number format code displays a date or time."""
+    format_code = FORMAT_STRIP_RE.sub('', format_code.split(';')[0])
+    return DATE_FORMAT_RE.search(format_code) is not None
+
+
+def is_timedelta_format(format_code):
+    """Check if a number format code displays an elapsed duration."""
+    return TIMEDELTA_FORMAT_RE.match(format_code.split(';')[0]) is not None
+
+
+def from_excel(value, date_mode, as_timedelta=False):
+    """Convert an Excel serial number to a datetime, time or timedelta like openpyxl does."""
+    if as_timedelta:
+        return timedelta(milliseconds=round(value * 86400 * 1000))
+    day, fraction = divmod(value, 1)
+    diff = timedelta(milliseconds=round(fraction * 86400 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        return (datetime.min + diff).time()
+    if 0 < value < 60 and not date_mode:
+        day += 1  # Excel treats 1900 as a leap year
+    return (MAC_EPOCH if date_mode else WINDOWS_EPOCH) + timedelta(days=day) + diff
+
+
+def iter_sheet_cells(stream, offset, strings, date_xfs, timedelta_xfs, date_mode):
+    """Yield (row, column, value) for every valued cell of one worksheet, 1-based."""
+
+    def number(xf, value):
+        if xf in date_xfs:
+            try:
+                return from_excel(value, date_mode, xf in timedelta_xfs)
+            except (OverflowError, ValueError):
+                return value
+        return value
+
+    depth = 0
+    pending_string = None
+    for record_type, data, continues in iter_records(stream, offset):
+        if record_type == RECORD_BOF:
+            depth += 1  # Embedded charts open their own BOF/EOF substream
+            continue
+        if record_type == RECORD_EOF:
+            depth -= 1
+            if depth <= 0:
+                break
+            continue
+        if depth > 1:
+            continue
+
+        if record_type == RECORD_NUMBER:
+            row, col, xf, value = struct.unpack_from('<HHHd', data)
+            yield row + 1, col + 1, number(xf, value)
+        elif record_type == RECORD_RK:
+            row, col, xf, rk = struct.unpack_from('<HHHI', data)
+            yield row + 1, col + 1, number(xf, decode_rk(rk))
+        elif record_type == RECORD_MULRK:
+            row, first_col = struct.unpack_from('<HH', data)
+            for index in range((len(data) - 6) // 6):
+                xf, rk = struct.unpack_from('<HI', data, 4 + index * 6)
+                yield row + 1, first_col + index + 1, number(xf, decode_rk(rk))
+        elif record_type == RECORD_LABELSST:
+            row, col, _, index = struct.unpack_from('<HHHI', data)
+            if index < len(strings):
+                yield row + 1, col + 1, strings[index]
+        elif record_type in (RECORD_LABEL, RECORD_RSTRING):
+            row, col = struct.unpack_from('<HH', data)
+            yield row + 1, col + 1, SegmentReader([data[6:]] + continues).read_string()
+        elif record_type == RECORD_BOOLERR:
+            row, col, _, value, is_error = struct.unpack_from('<HHHBB', data)
+            if is_error:
+                yield row + 1, col + 1, ERROR_CODES.get(value, '#N/A')
+            else:
+                yield row + 1, col + 1, bool(value)
+        elif record_type == RECORD_FORMULA:
+            row, col, xf = struct.unpack_from('<HHH', data)
+            result = data[6:14]
+            pending_string = None
+            if result[6:8] != b'\xff\xff':
+                yield row + 1, col + 1, number(xf, struct.unpack('<d', result)[0])
+            elif result[0] == 0:
+                pending_string = (row, col)  # Cached text follows in a STRING record
+            elif result[0] == 1:
+                yield row + 1, col + 1, bool(result[2])
+            elif result[0] == 2:
+                yield row + 1, col + 1, ERROR_CODES.get(result[2], '#N/A')
+        elif record_type == RECORD_STRING and pending_string:
+            row, col = pending_string
+            pending_string = None
+            yield row + 1, col + 1, SegmentReader([data] + continues).read_string()
+
+
+def read_xls_sheets(file_path):
+    """Read a BIFF8 .xls file and yield its worksheets with lazily streamed cell values."""
+    with open(file_path, 'rb') as f:
+        stream = read_workbook_stream(f.read())
+
+    records = iter_records(stream)
+    record_type, data, _ = next(records, (None, b'', None))
+    if record_type != RECORD_BOF or struct.unpack_from('<H', data + b'\0\0')[0] != BIFF8_VERSION:
+        raise XlsReadError('Only BIFF8 (Excel 97-2003) .xls files are supported')
+
+    date_mode = 0
+    formats = {}
+    xf_formats = []
+    sheets = []
+    strings = []
+    for record_type, data, continues in records:
+        if record_type == RECORD_EOF:
+            break
+        if record_type == RECORD_FILEPASS:
+            raise XlsReadError('Password protected .xls files are not supported')
+        if record_type == RECORD_DATEMODE:
+            date_mode, = struct.unpack_from('<H', data)
+        elif record_type == RECORD_FORMAT:
+            format_id, = struct.unpack_from('<H', data)
+            formats[format_id] = SegmentReader([data[2:]] + continues).read_string()
+        elif record_type == RECORD_XF:
+            xf_formats.append(struct.unpack_from('<H', data, 2)[0])
+        elif record_type == RECORD_BOUNDSHEET:
+            offset, state, sheet_type = struct.unpack_from('<IBB', data)
+            if sheet_type == 0:  # Worksheets only; skip charts and macro sheets
+                name = SegmentReader([data[6:]]).read_string(length_size=1)
+                sheets.append((name, SHEET_STATES.get(state & 0x03, 'visible'), offset))
+        elif record_type == RECORD_SST:
+            reader = SegmentReader([data] + continues)
+            _, unique_count = struct.unpack('<II', reader.read(8))
+            # Some writers overstate the count, so stop when the data runs out
+            strings = []
+            while len(strings) < unique_count and not reader.at_end():
+                strings.append(reader.read_string())
+
+    if not sheets:
+        raise XlsReadError('No worksheets found; the file only holds charts or macro sheets')
+
+    # Resolve which cell formats hold dates once, instead of per cell
+    date_xfs, timedelta_xfs = set(), set()
+    for xf, format_id in enumerate(xf_formats):
+        if format_id in formats:
+            if is_date_format(formats[format_id]):
+                date_xfs.add(xf)
+                if is_timedelta_format(formats[format_id]):
+                    timedelta_xfs.add(xf)
+        elif format_id in BUILTIN_DATE_FORMATS:
+            date_xfs.add(xf)
+            if format_id in BUILTIN_TIMEDELTA_FORMATS:
+                timedelta_xfs.add(xf)
+
+    for name, state, offset in sheets:
+        yield XlsSheet(name, state,
+                       iter_sheet_cells(stream, offset, strings, date_xfs, timedelta_xfs, date_mode))